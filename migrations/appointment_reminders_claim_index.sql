@@ -0,0 +1,23 @@
+-- ============================================
+-- Migration: appointment_reminders claim index
+-- Run this in Supabase SQL Editor or via psql
+-- Description: scripts/reminder_worker.py 以 INSERT ... ON CONFLICT DO NOTHING
+--              認領提醒，此唯一索引保證同一預約同一類型提醒只會有一筆
+--              pending / sent / skipped 記錄（failed 可重試）
+-- ============================================
+
+-- 既有重複記錄保留最早一筆，其餘標記為 failed，否則唯一索引無法建立
+UPDATE appointment_reminders r
+SET status = 'failed', error_message = 'duplicate reminder'
+WHERE r.status IN ('pending', 'sent', 'skipped')
+  AND EXISTS (
+    SELECT 1 FROM appointment_reminders o
+    WHERE o.appointment_id = r.appointment_id
+      AND o.reminder_type = r.reminder_type
+      AND o.status IN ('pending', 'sent', 'skipped')
+      AND o.id < r.id
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_appointment_reminders_claim
+    ON appointment_reminders(appointment_id, reminder_type)
+    WHERE status IN ('pending', 'sent', 'skipped');
@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+"""Index usage, duplicate-index and bloat monitor for Supabase Postgres.
+
+Periodically samples pg_stat_user_indexes, pg_stat_user_tables and
+pg_stat_statements into a local SQLite time-series store, and reports:
+
+- duplicate indexes (same table, access method, key columns and predicate)
+- redundant-prefix indexes (a non-unique btree whose columns are a leading
+  prefix of another btree on the same table, e.g. (tenant_id) next to
+  (tenant_id, service_id, role_type))
+- indexes that are never scanned, with the writes they cost on their table
+- estimated table and index bloat
+- top statements by total execution time
+
+`check-sql` runs the duplicate / prefix checks over CREATE INDEX statements in
+migration files, so overlaps can be caught before they reach the database.
+
+Usage:
+    python scripts/index_monitor.py sample                   # one sample
+    python scripts/index_monitor.py sample --interval 900    # every 15 minutes
+    python scripts/index_monitor.py report --since 7d
+    python scripts/index_monitor.py check-sql migrations/*.sql scripts/create_new_tables.sql
+
+Environment:
+    DATABASE_URL  Supabase Postgres connection string (see scripts/db_query.py)
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from db_query import QueryExecutor, split_statements
+
+STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".manus", "monitor", "index_stats.sqlite3",
+)
+TOP_STATEMENTS_SAMPLED = 50
+DEFAULT_TOP = 10
+BLOAT_MIN_BYTES = 1024 * 1024
+BLOAT_MIN_RATIO = 0.3
+
+# Page layout constants used by the bloat estimates
+PAGE_HEADER = 24
+BTREE_SPECIAL = 16
+ITEM_ID = 4
+INDEX_TUPLE_HEADER = 8
+HEAP_TUPLE_HEADER = 24
+MAXALIGN = 8
+
+
+# ============================================================
+# Catalog queries
+# ============================================================
+
+INDEXES_SQL = """
+SELECT n.nspname AS schema, t.relname AS "table", i.relname AS "index",
+       am.amname AS am, ix.indisunique AS is_unique, ix.indisprimary AS is_primary,
+       ARRAY(
+         SELECT COALESCE(a.attname, '(expression)')
+         FROM unnest(ix.indkey) WITH ORDINALITY AS k(attnum, ord)
+         LEFT JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = k.attnum
+         WHERE k.ord <= ix.indnkeyatts
+         ORDER BY k.ord
+       )::text[] AS columns,
+       pg_get_expr(ix.indexprs, ix.indrelid) AS expressions,
+       pg_get_expr(ix.indpred, ix.indrelid) AS predicate,
+       pg_get_indexdef(ix.indexrelid) AS indexdef,
+       i.relpages::bigint AS relpages, i.reltuples::float8 AS reltuples, i.reloptions::text[] AS reloptions,
+       pg_relation_size(ix.indexrelid)::bigint AS size_bytes,
+       s.idx_scan::bigint AS idx_scan, s.idx_tup_read::bigint AS idx_tup_read,
+       s.idx_tup_fetch::bigint AS idx_tup_fetch
+FROM pg_stat_user_indexes s
+JOIN pg_index ix ON ix.indexrelid = s.indexrelid
+JOIN pg_class i ON i.oid = ix.indexrelid
+JOIN pg_class t ON t.oid = ix.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+JOIN pg_am am ON am.oid = i.relam
+"""
+
+TABLES_SQL = """
+SELECT s.schemaname AS schema, s.relname AS "table",
+       s.seq_scan::bigint AS seq_scan, COALESCE(s.idx_scan, 0)::bigint AS idx_scan,
+       s.n_tup_ins::bigint AS n_tup_ins, s.n_tup_upd::bigint AS n_tup_upd, s.n_tup_del::bigint AS n_tup_del,
+       s.n_live_tup::bigint AS n_live_tup, s.n_dead_tup::bigint AS n_dead_tup,
+       c.relpages::bigint AS relpages, c.reltuples::float8 AS reltuples, c.reloptions::text[] AS reloptions,
+       pg_relation_size(c.oid)::bigint AS size_bytes
+FROM pg_stat_user_tables s
+JOIN pg_class c ON c.oid = s.relid
+"""
+
+COLUMN_STATS_SQL = """
+SELECT schemaname AS schema, tablename AS "table", attname AS "column",
+       avg_width::int AS avg_width, null_frac::float8 AS null_frac
+FROM pg_stats
+WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+"""
+
+BLOCK_SIZE_SQL = "SELECT current_setting('block_size')::int AS block_size"
+
+# pg_stat_statements keeps one row per (userid, dbid, queryid); fold the
+# per-role rows together so each queryid is stored and ranked once
+STATEMENTS_SQL = """
+SELECT queryid::text AS queryid, min(query) AS query,
+       sum(calls)::bigint AS calls,
+       sum({total})::float8 AS total_ms,
+       (sum({total}) / NULLIF(sum(calls), 0))::float8 AS mean_ms,
+       sum(rows)::bigint AS rows
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+  AND queryid IS NOT NULL
+GROUP BY queryid
+ORDER BY sum({total}) DESC
+LIMIT {limit}
+"""
+
+
+def _fetch(executor, query):
+    result = executor.execute(query)
+    if "returncode" in result:
+        raise RuntimeError("\n".join(result["logs"]))
+    return result["rows"]
+
+
+def fetch_statements(executor, limit=TOP_STATEMENTS_SAMPLED):
+    """Top statements from pg_stat_statements, or [] if the extension is missing."""
+    # PG 13 renamed total_time to total_exec_time
+    for total in ("total_exec_time", "total_time"):
+        result = executor.execute(STATEMENTS_SQL.format(total=total, limit=int(limit)))
+        if "returncode" not in result:
+            return result["rows"]
+        if "does not exist" in " ".join(result["logs"]) and "pg_stat_statements" in " ".join(result["logs"]):
+            break
+    print("[IndexMonitor] pg_stat_statements unavailable, skipping statements", file=sys.stderr)
+    return []
+
+
+# ============================================================
+# Bloat estimates
+# ============================================================
+
+def _align(n):
+    return int(math.ceil(n / MAXALIGN) * MAXALIGN)
+
+
+def _fillfactor(reloptions, default):
+    for option in reloptions or []:
+        if option.startswith("fillfactor="):
+            return int(option.split("=", 1)[1])
+    return default
+
+
+def estimate_index_bloat(index, column_stats, block_size):
+    """Estimated wasted bytes in a btree index, or None if it cannot be estimated."""
+    if index["am"] != "btree" or index["expressions"] or not index["reltuples"] or index["reltuples"] < 0:
+        return None
+    widths = [column_stats.get((index["schema"], index["table"], col)) for col in index["columns"]]
+    if any(w is None for w in widths):
+        return None
+    tuple_size = _align(INDEX_TUPLE_HEADER + sum(w for w, _ in widths)) + ITEM_ID
+    usable = (block_size - PAGE_HEADER - BTREE_SPECIAL) * _fillfactor(index["reloptions"], 90) / 100
+    ideal_pages = math.ceil(index["reltuples"] * tuple_size / usable) + 1
+    return max(0, index["relpages"] - ideal_pages) * block_size
+
+
+def estimate_table_bloat(table, table_columns, block_size):
+    """Estimated wasted bytes in a heap, or None if the table has no statistics."""
+    if not table_columns or not table["reltuples"] or table["reltuples"] < 0:
+        return None
+    data_width = sum(w * (1 - null_frac) for w, null_frac in table_columns)
+    tuple_size = _align(HEAP_TUPLE_HEADER) + _align(data_width) + ITEM_ID
+    usable = (block_size - PAGE_HEADER) * _fillfactor(table["reloptions"], 100) / 100
+    ideal_pages = math.ceil(table["reltuples"] * tuple_size / usable)
+    return max(0, table["relpages"] - ideal_pages) * block_size
+
+
+# ============================================================
+# Duplicate / redundant index detection
+# ============================================================
+
+def _signature(index):
+    return (index["schema"], index["table"], index.get("am") or "btree",
+            tuple(index["columns"]), index.get("expressions") or "", index.get("predicate") or "")
+
+
+def _keep_rank(index):
+    # Prefer keeping constraint-backing indexes, then the one actually used
+    return (bool(index.get("is_primary")), bool(index.get("is_unique")), index.get("idx_scan") or 0)
+
+
+def find_overlapping_indexes(indexes):
+    """Return findings for duplicate and redundant-prefix indexes.
+
+    Each finding is {"kind", "index", "covered_by", "table", "columns"}; `index`
+    is the one that can be dropped. Unique and primary-key indexes are never
+    reported as droppable prefixes, since they enforce a constraint.
+    """
+    findings = []
+    by_signature = {}
+    for index in indexes:
+        by_signature.setdefault(_signature(index), []).append(index)
+
+    duplicates = set()
+    for group in by_signature.values():
+        if len(group) < 2:
+            continue
+        keep = max(group, key=_keep_rank)
+        for index in group:
+            if index is keep:
+                continue
+            duplicates.add((index["schema"], index["index"]))
+            findings.append({
+                "kind": "duplicate",
+                "table": f"{index['schema']}.{index['table']}",
+                "index": index["index"],
+                "covered_by": keep["index"],
+                "columns": list(index["columns"]),
+            })
+
+    for index in indexes:
+        if (index["schema"], index["index"]) in duplicates:
+            continue
+        if index.get("is_unique") or index.get("is_primary") or index.get("expressions"):
+            continue
+        if (index.get("am") or "btree") != "btree":
+            continue
+        cols = tuple(index["columns"])
+        for other in indexes:
+            if other is index or (other["schema"], other["index"]) in duplicates:
+                continue
+            if (other["schema"], other["table"]) != (index["schema"], index["table"]):
+                continue
+            if (other.get("am") or "btree") != "btree" or other.get("expressions"):
+                continue
+            if (other.get("predicate") or "") != (index.get("predicate") or ""):
+                continue
+            other_cols = tuple(other["columns"])
+            if len(other_cols) > len(cols) and other_cols[:len(cols)] == cols:
+                findings.append({
+                    "kind": "redundant_prefix",
+                    "table": f"{index['schema']}.{index['table']}",
+                    "index": index["index"],
+                    "covered_by": other["index"],
+                    "columns": list(cols),
+                })
+                break
+    return findings
+
+
+# ============================================================
+# Time-series store
+# ============================================================
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sampled_at REAL NOT NULL,
+    block_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_samples (
+    sample_id INTEGER NOT NULL REFERENCES samples(id),
+    schema TEXT NOT NULL,
+    "table" TEXT NOT NULL,
+    "index" TEXT NOT NULL,
+    am TEXT,
+    is_unique INTEGER,
+    is_primary INTEGER,
+    columns TEXT,
+    expressions TEXT,
+    predicate TEXT,
+    indexdef TEXT,
+    size_bytes INTEGER,
+    idx_scan INTEGER,
+    idx_tup_read INTEGER,
+    idx_tup_fetch INTEGER,
+    est_bloat_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS table_samples (
+    sample_id INTEGER NOT NULL REFERENCES samples(id),
+    schema TEXT NOT NULL,
+    "table" TEXT NOT NULL,
+    seq_scan INTEGER,
+    idx_scan INTEGER,
+    n_tup_ins INTEGER,
+    n_tup_upd INTEGER,
+    n_tup_del INTEGER,
+    n_live_tup INTEGER,
+    n_dead_tup INTEGER,
+    size_bytes INTEGER,
+    est_bloat_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS statement_samples (
+    sample_id INTEGER NOT NULL REFERENCES samples(id),
+    queryid TEXT NOT NULL,
+    query TEXT,
+    calls INTEGER,
+    total_ms REAL,
+    mean_ms REAL,
+    rows INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_index_samples_sample ON index_samples(sample_id);
+CREATE INDEX IF NOT EXISTS idx_table_samples_sample ON table_samples(sample_id);
+CREATE INDEX IF NOT EXISTS idx_statement_samples_sample ON statement_samples(sample_id);
+"""
+
+
+def open_store(path=STORE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(STORE_SCHEMA)
+    return conn
+
+
+def take_sample(executor, store):
+    """Sample index, table and statement statistics into the store; returns the sample id."""
+    block_size = _fetch(executor, BLOCK_SIZE_SQL)[0]["block_size"]
+    indexes = _fetch(executor, INDEXES_SQL)
+    tables = _fetch(executor, TABLES_SQL)
+    column_stats = {
+        (row["schema"], row["table"], row["column"]): (row["avg_width"], row["null_frac"])
+        for row in _fetch(executor, COLUMN_STATS_SQL)
+    }
+    statements = fetch_statements(executor)
+
+    columns_by_table = {}
+    for (schema, table, _), stats in column_stats.items():
+        columns_by_table.setdefault((schema, table), []).append(stats)
+
+    with store:
+        sample_id = store.execute(
+            "INSERT INTO samples (sampled_at, block_size) VALUES (?, ?)", (time.time(), block_size),
+        ).lastrowid
+        store.executemany(
+            "INSERT INTO index_samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (sample_id, i["schema"], i["table"], i["index"], i["am"], int(i["is_unique"]),
+                 int(i["is_primary"]), json.dumps(i["columns"]), i["expressions"], i["predicate"],
+                 i["indexdef"], i["size_bytes"], i["idx_scan"], i["idx_tup_read"], i["idx_tup_fetch"],
+                 estimate_index_bloat(i, column_stats, block_size))
+                for i in indexes
+            ],
+        )
+        store.executemany(
+            "INSERT INTO table_samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (sample_id, t["schema"], t["table"], t["seq_scan"], t["idx_scan"], t["n_tup_ins"],
+                 t["n_tup_upd"], t["n_tup_del"], t["n_live_tup"], t["n_dead_tup"], t["size_bytes"],
+                 estimate_table_bloat(t, columns_by_table.get((t["schema"], t["table"])), block_size))
+                for t in tables
+            ],
+        )
+        store.executemany(
+            "INSERT INTO statement_samples VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(sample_id, s["queryid"], s["query"], s["calls"], s["total_ms"], s["mean_ms"], s["rows"])
+             for s in statements],
+        )
+    return sample_id
+
+
+# ============================================================
+# Report
+# ============================================================
+
+def _parse_since(value):
+    match = re.fullmatch(r"(\d+)([smhd])", value or "")
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration '{value}', expected e.g. 30m, 12h, 7d")
+    return int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+
+
+def _delta(latest, earliest):
+    # A negative delta means statistics were reset in between
+    if earliest is None or latest is None:
+        return latest
+    return latest - earliest if latest >= earliest else latest
+
+
+def build_report(store, since_seconds, top=DEFAULT_TOP):
+    samples = store.execute(
+        "SELECT id, sampled_at FROM samples WHERE sampled_at >= ? ORDER BY sampled_at",
+        (time.time() - since_seconds,),
+    ).fetchall()
+    if not samples:
+        return None
+    first_id, last_id = samples[0]["id"], samples[-1]["id"]
+
+    indexes = [dict(row) for row in store.execute("SELECT * FROM index_samples WHERE sample_id = ?", (last_id,))]
+    for index in indexes:
+        index["columns"] = json.loads(index["columns"])
+    first_scans = {
+        (row["schema"], row["index"]): row["idx_scan"]
+        for row in store.execute('SELECT schema, "index", idx_scan FROM index_samples WHERE sample_id = ?', (first_id,))
+    }
+    tables = {
+        (row["schema"], row["table"]): dict(row)
+        for row in store.execute("SELECT * FROM table_samples WHERE sample_id = ?", (last_id,))
+    }
+    first_tables = {
+        (row["schema"], row["table"]): dict(row)
+        for row in store.execute("SELECT * FROM table_samples WHERE sample_id = ?", (first_id,))
+    }
+
+    def table_writes(schema, table):
+        latest, earliest = tables.get((schema, table)), first_tables.get((schema, table))
+        if not latest:
+            return None
+        return sum(
+            _delta(latest[col], earliest[col] if earliest and first_id != last_id else None) or 0
+            for col in ("n_tup_ins", "n_tup_upd", "n_tup_del")
+        )
+
+    unused = []
+    for index in indexes:
+        if index["is_unique"] or index["is_primary"]:
+            continue
+        scans_in_window = _delta(index["idx_scan"], first_scans.get((index["schema"], index["index"])))
+        if index["idx_scan"] == 0 or (first_id != last_id and scans_in_window == 0):
+            unused.append({
+                "table": f"{index['schema']}.{index['table']}",
+                "index": index["index"],
+                "size_bytes": index["size_bytes"],
+                "idx_scan_total": index["idx_scan"],
+                "table_writes": table_writes(index["schema"], index["table"]),
+            })
+    unused.sort(key=lambda u: u["size_bytes"] or 0, reverse=True)
+
+    bloated_indexes = sorted(
+        (
+            {"table": f"{i['schema']}.{i['table']}", "index": i["index"], "size_bytes": i["size_bytes"],
+             "est_bloat_bytes": i["est_bloat_bytes"]}
+            for i in indexes
+            if i["est_bloat_bytes"] and i["est_bloat_bytes"] >= BLOAT_MIN_BYTES
+            and i["est_bloat_bytes"] >= BLOAT_MIN_RATIO * (i["size_bytes"] or 0)
+        ),
+        key=lambda b: b["est_bloat_bytes"], reverse=True,
+    )
+    bloated_tables = sorted(
+        (
+            {"table": f"{t['schema']}.{t['table']}", "size_bytes": t["size_bytes"],
+             "est_bloat_bytes": t["est_bloat_bytes"], "n_dead_tup": t["n_dead_tup"]}
+            for t in tables.values()
+            if t["est_bloat_bytes"] and t["est_bloat_bytes"] >= BLOAT_MIN_BYTES
+            and t["est_bloat_bytes"] >= BLOAT_MIN_RATIO * (t["size_bytes"] or 0)
+        ),
+        key=lambda b: b["est_bloat_bytes"], reverse=True,
+    )
+
+    first_statements = {
+        row["queryid"]: dict(row)
+        for row in store.execute("SELECT * FROM statement_samples WHERE sample_id = ?", (first_id,))
+    } if first_id != last_id else {}
+    statements = []
+    for row in store.execute("SELECT * FROM statement_samples WHERE sample_id = ?", (last_id,)):
+        earliest = first_statements.get(row["queryid"])
+        calls = _delta(row["calls"], earliest["calls"] if earliest else None)
+        total_ms = _delta(row["total_ms"], earliest["total_ms"] if earliest else None)
+        statements.append({
+            "queryid": row["queryid"],
+            "query": row["query"],
+            "calls": calls,
+            "total_ms": round(total_ms, 1),
+            "mean_ms": round(total_ms / calls, 2) if calls else 0.0,
+        })
+    statements.sort(key=lambda s: s["total_ms"], reverse=True)
+
+    return {
+        "window": {"from": samples[0]["sampled_at"], "to": samples[-1]["sampled_at"], "samples": len(samples)},
+        "overlapping_indexes": find_overlapping_indexes(indexes),
+        "unused_indexes": unused,
+        "bloated_indexes": bloated_indexes,
+        "bloated_tables": bloated_tables,
+        "top_statements": statements[:top],
+    }
+
+
+def _size(n):
+    if n is None:
+        return "-"
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def print_report(report):
+    window = report["window"]
+    print(f"Window: {time.strftime('%Y-%m-%d %H:%M', time.localtime(window['from']))} → "
+          f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(window['to']))} ({window['samples']} samples)")
+
+    print("\n== Duplicate / redundant-prefix indexes ==")
+    for f in report["overlapping_indexes"]:
+        print(f"  [{f['kind']}] {f['table']}.{f['index']} ({', '.join(f['columns'])}) covered by {f['covered_by']}")
+    if not report["overlapping_indexes"]:
+        print("  none")
+
+    print("\n== Unused indexes (no scans in window) ==")
+    for u in report["unused_indexes"]:
+        writes = "-" if u["table_writes"] is None else u["table_writes"]
+        print(f"  {u['table']}.{u['index']}  size={_size(u['size_bytes'])}  table writes={writes}")
+    if not report["unused_indexes"]:
+        print("  none")
+
+    print("\n== Estimated bloat ==")
+    for b in report["bloated_tables"]:
+        print(f"  table {b['table']}  {_size(b['est_bloat_bytes'])} of {_size(b['size_bytes'])}"
+              f"  dead tuples={b['n_dead_tup']}")
+    for b in report["bloated_indexes"]:
+        print(f"  index {b['table']}.{b['index']}  {_size(b['est_bloat_bytes'])} of {_size(b['size_bytes'])}")
+    if not report["bloated_tables"] and not report["bloated_indexes"]:
+        print("  none")
+
+    print("\n== Top statements by total time ==")
+    for s in report["top_statements"]:
+        query = " ".join(s["query"].split())
+        print(f"  {s['total_ms']:>12.1f} ms  calls={s['calls']:<8} mean={s['mean_ms']} ms  {query[:120]}")
+    if not report["top_statements"]:
+        print("  none (pg_stat_statements not sampled)")
+
+
+# ============================================================
+# Static check of migration files
+# ============================================================
+
+CREATE_INDEX_RE = re.compile(
+    r"CREATE\s+(?P<unique>UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"(?P<name>[\w\"]+)\s+ON\s+(?:ONLY\s+)?(?P<table>[\w\".]+)\s*(?:USING\s+(?P<am>\w+)\s*)?\(",
+    re.IGNORECASE,
+)
+INDEX_TAIL_RE = re.compile(
+    r"\s*(?:INCLUDE\s*\(.*?\)\s*)?(?:WITH\s*\(.*?\)\s*)?(?:TABLESPACE\s+\S+\s*)?"
+    r"(?:WHERE\s+(?P<predicate>.*))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _unquote(name):
+    return name.replace('"', "")
+
+
+def _split_columns(text):
+    columns, depth, buf = [], 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            columns.append("".join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+    columns.append("".join(buf).strip())
+    return columns
+
+
+def _closing_paren(text, start):
+    """Index of the ')' closing the '(' just before `start`, or -1."""
+    depth = 1
+    for i in range(start, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def parse_create_indexes(sql, source=""):
+    """Extract index definitions from CREATE INDEX statements in a SQL script."""
+    indexes = []
+    for statement in split_statements(sql):
+        body = "\n".join(line for line in statement.splitlines() if not line.strip().startswith("--")).strip()
+        match = CREATE_INDEX_RE.match(body)
+        if not match:
+            continue
+        end = _closing_paren(body, match.end())
+        tail = INDEX_TAIL_RE.match(body, end + 1) if end >= 0 else None
+        if not tail:
+            continue
+        table = _unquote(match.group("table"))
+        schema, _, table = table.rpartition(".")
+        columns, expressions = [], []
+        for col in _split_columns(body[match.end():end]):
+            col = re.sub(r"\s+(ASC|DESC)\b.*$", "", col, flags=re.IGNORECASE).strip()
+            if re.fullmatch(r'[\w"]+', col):
+                columns.append(_unquote(col).lower())
+            else:
+                columns.append("(expression)")
+                expressions.append(col)
+        indexes.append({
+            "schema": schema or "public",
+            "table": table.lower(),
+            "index": _unquote(match.group("name")),
+            "am": (match.group("am") or "btree").lower(),
+            "is_unique": bool(match.group("unique")),
+            "is_primary": False,
+            "columns": columns,
+            "expressions": ", ".join(expressions) or None,
+            "predicate": " ".join((tail.group("predicate") or "").split()) or None,
+            "source": source,
+        })
+    return indexes
+
+
+def check_sql(paths):
+    """Report overlapping indexes declared across SQL files; returns the findings."""
+    indexes = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            sql = f.read()
+        if path.endswith(".py"):
+            # scripts/*.py keep their DDL in triple-quoted strings
+            sql = "\n".join(re.findall(r'"""(.*?)"""', sql, re.DOTALL))
+        for index in parse_create_indexes(sql, source=path):
+            # Index names are unique per schema; a repeated IF NOT EXISTS is the same index
+            indexes.setdefault((index["schema"], index["index"]), index)
+    by_name = {index["index"]: index for index in indexes.values()}
+    findings = find_overlapping_indexes(list(indexes.values()))
+    for f in findings:
+        print(f"[{f['kind']}] {f['table']}.{f['index']} ({', '.join(f['columns'])}) "
+              f"[{by_name[f['index']]['source']}] covered by {f['covered_by']} "
+              f"[{by_name[f['covered_by']]['source']}]")
+    return findings
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite time-series store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sample_cmd = sub.add_parser("sample", help="sample statistics into the store")
+    sample_cmd.add_argument("--interval", type=float, default=0, help="seconds between samples; 0 samples once")
+
+    report_cmd = sub.add_parser("report", help="report from the stored samples")
+    report_cmd.add_argument("--since", type=_parse_since, default="7d", help="history window, e.g. 12h, 7d")
+    report_cmd.add_argument("--top", type=int, default=DEFAULT_TOP)
+    report_cmd.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    check_cmd = sub.add_parser("check-sql", help="check CREATE INDEX statements in SQL files")
+    check_cmd.add_argument("paths", nargs="+")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check-sql":
+        return 1 if check_sql(args.paths) else 0
+
+    store = open_store(args.store)
+    try:
+        if args.command == "report":
+            report = build_report(store, args.since, top=args.top)
+            if report is None:
+                print("No samples in the window; run `index_monitor.py sample` first", file=sys.stderr)
+                return 1
+            if args.json:
+                print(json.dumps(report, ensure_ascii=False, indent=2))
+            else:
+                print_report(report)
+            return 0
+
+        try:
+            executor = QueryExecutor.from_env("supabase", pool_size=1, log_dir=None)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        with executor:
+            while True:
+                try:
+                    sample_id = take_sample(executor, store)
+                except (RuntimeError, sqlite3.Error) as e:
+                    # a failed sample writes nothing (the store insert is one
+                    # transaction); keep the periodic sampler alive
+                    print(f"[IndexMonitor] sample failed: {e}", file=sys.stderr)
+                    if not args.interval:
+                        return 1
+                else:
+                    print(f"[IndexMonitor] sample {sample_id} stored in {args.store}")
+                    if not args.interval:
+                        break
+                time.sleep(args.interval)
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
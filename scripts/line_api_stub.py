@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Local stand-in for the LINE Messaging API push / multicast endpoints.
+
+Accepts POST /v2/bot/message/push and /v2/bot/message/multicast, validates the
+request shape the way LINE does (bearer token, user ids, recipient and message
+limits) and records every accepted request. GET /_requests returns the recorded
+requests as JSON, GET /_attempts every POST with its response status;
+DELETE /_requests clears both.
+
+Failure injection for exercising retries in scripts/reminder_worker.py:
+    --fail-every N     every Nth request answers --fail-status (default 429)
+    --delay SECONDS    artificial latency per request
+
+Usage:
+    python scripts/line_api_stub.py --port 8089 --fail-every 5
+    LINE_API_BASE=http://127.0.0.1:8089/v2/bot python scripts/reminder_worker.py
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_MULTICAST_RECIPIENTS = 500
+MAX_MESSAGES = 5
+
+
+class StubState:
+    def __init__(self, fail_every=0, fail_status=429, delay=0.0):
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.delay = delay
+        self.counter = itertools.count(1)
+        self.requests = []
+        self.attempts = []
+        self.retry_keys = {}
+        # _reply records attempts and is called with the lock already held
+        self.lock = threading.RLock()
+
+
+def validate(path, body):
+    messages = body.get("messages")
+    if not isinstance(messages, list) or not 1 <= len(messages) <= MAX_MESSAGES:
+        return f"messages must contain 1-{MAX_MESSAGES} items"
+    to = body.get("to")
+    if path.endswith("/push"):
+        if not isinstance(to, str) or not to:
+            return "to must be a user id"
+    elif not isinstance(to, list) or not 1 <= len(to) <= MAX_MULTICAST_RECIPIENTS:
+        return f"to must contain 1-{MAX_MULTICAST_RECIPIENTS} user ids"
+    # LINE user ids start with "U"; one bad id rejects the whole request
+    for i, user_id in enumerate([to] if isinstance(to, str) else to):
+        if not isinstance(user_id, str) or not user_id.startswith("U"):
+            return f"The property, 'to[{i}]', in the request body is invalid"
+    return None
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload, headers=None):
+            if self.command == "POST":
+                with state.lock:
+                    state.attempts.append({
+                        "path": self.path,
+                        "retry_key": self.headers.get("X-Line-Retry-Key"),
+                        "status": status,
+                    })
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("x-line-request-id", str(uuid.uuid4()))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path in ("/_requests", "/_attempts"):
+                with state.lock:
+                    return self._reply(200, state.requests if self.path == "/_requests" else state.attempts)
+            self._reply(404, {"message": "Not found"})
+
+        def do_DELETE(self):
+            if self.path == "/_requests":
+                with state.lock:
+                    state.requests.clear()
+                    state.attempts.clear()
+                    state.retry_keys.clear()
+                return self._reply(200, {})
+            self._reply(404, {"message": "Not found"})
+
+        def do_POST(self):
+            if self.path not in ("/v2/bot/message/push", "/v2/bot/message/multicast"):
+                return self._reply(404, {"message": "Not found"})
+            if state.delay:
+                time.sleep(state.delay)
+
+            auth = self.headers.get("Authorization", "")
+            if not auth.startswith("Bearer ") or not auth[len("Bearer "):]:
+                return self._reply(401, {"message": "Authentication failed"})
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"message": "The request body has 1 error(s)"})
+            error = validate(self.path, body)
+            if error:
+                return self._reply(400, {"message": error})
+
+            retry_key = self.headers.get("X-Line-Retry-Key")
+            with state.lock:
+                if retry_key and retry_key in state.retry_keys:
+                    return self._reply(
+                        409, {"message": "The retry key is already accepted"},
+                        {"x-line-accepted-request-id": state.retry_keys[retry_key]},
+                    )
+                n = next(state.counter)
+                if state.fail_every and n % state.fail_every == 0:
+                    return self._reply(
+                        state.fail_status, {"message": "Injected failure"},
+                        {"Retry-After": "0"} if state.fail_status == 429 else None,
+                    )
+                request_id = str(uuid.uuid4())
+                if retry_key:
+                    state.retry_keys[retry_key] = request_id
+                state.requests.append({
+                    "path": self.path,
+                    "token": auth[len("Bearer "):],
+                    "retry_key": retry_key,
+                    "body": body,
+                })
+            self._reply(200, {})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    state = StubState(args.fail_every, args.fail_status, args.delay)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"LINE API stub listening on http://{args.host}:{args.port}/v2/bot")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
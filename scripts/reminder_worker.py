@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""Batched asyncio dispatcher for LINE appointment reminders.
+
+Python counterpart of server/cron/reminderScheduler.ts for high-volume runs:
+
+1. Claims due appointments in bulk (FOR UPDATE SKIP LOCKED) and records a
+   `pending` row per appointment in appointment_reminders with one INSERT, so
+   several workers can run side by side without double-sending.
+2. Groups identical Flex payloads per LINE channel and sends them with
+   /message/multicast (up to 500 recipients), falling back to /message/push
+   for single recipients.
+3. Sends through one pooled HTTP client with a per-channel token bucket and
+   retries 429 / 5xx / network errors with backoff. X-Line-Retry-Key is
+   derived from the appointments in the request, so LINE answers 409 instead
+   of delivering again when a request is retried, or resent after a worker
+   died before recording its results (within LINE's 24 hour key window).
+4. Writes sent / failed results back with one batched UPDATE per claim.
+
+A failed reminder is not claimed again within the same run. Across runs it is
+retried until it has DEFAULT_MAX_ATTEMPTS failed rows, except permanent
+rejections (revoked token, or a push rejected with 4xx), which are never
+retried. A multicast rejected with 400 is resent as one push per recipient,
+so one invalid user id does not fail the whole chunk.
+
+Requires migrations/appointment_reminders_claim_index.sql.
+
+Usage:
+    python scripts/reminder_worker.py                  # 24h + 2h, then exit
+    python scripts/reminder_worker.py --type 2h --interval 300
+    LINE_API_BASE=http://127.0.0.1:8089/v2/bot python scripts/reminder_worker.py
+
+Environment:
+    DATABASE_URL               Supabase Postgres connection string
+    LINE_CHANNEL_ACCESS_TOKEN  system default channel (tenants without their own)
+    LINE_API_BASE              defaults to https://api.line.me/v2/bot;
+                               point at scripts/line_api_stub.py for local tests
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from zoneinfo import ZoneInfo
+
+import httpx
+
+LINE_API_BASE = os.environ.get("LINE_API_BASE", "https://api.line.me/v2/bot")
+SYSTEM_LINE_CHANNEL_ACCESS_TOKEN = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN", "")
+
+REMINDER_WINDOWS = {"24h": 24, "2h": 2}
+# Same ±30 minute scan window as reminderScheduler.ts
+WINDOW_MINUTES = 30
+MULTICAST_LIMIT = 500
+DEFAULT_TIMEZONE = "Asia/Taipei"
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RATE = 50.0  # requests per second per channel
+DEFAULT_BURST = 50
+DEFAULT_MAX_RETRIES = 4
+# Failed rows per appointment / reminder type before it is no longer claimed
+DEFAULT_MAX_ATTEMPTS = 3
+# A pending row older than this belongs to a worker that died mid-send
+CLAIM_LEASE = datetime.timedelta(minutes=15)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Channel token rejected: no request with it will succeed
+TOKEN_ERROR_STATUS = {401, 403}
+# error_message prefix for rejections that will not succeed on retry
+PERMANENT_ERROR_PREFIX = "[permanent] "
+# uuid5 namespace for X-Line-Retry-Key
+RETRY_KEY_NAMESPACE = uuid.UUID("6f1c2a4e-8d3b-5e7a-9c10-2b4d6e8f0a13")
+
+
+# ============================================================
+# Flex Message（與 reminderScheduler.ts buildReminderFlexMessage 相同）
+# ============================================================
+
+def build_reminder_flex_message(customer_name, appointment_date, appointment_time, reminder_type,
+                                clinic_name="曜友仟診所", clinic_address="", notes=""):
+    is_urgent = reminder_type == "2h"
+    header_text = "⏰ 預約即將開始" if is_urgent else "📅 預約提醒通知"
+    header_color = "#FF6B6B" if is_urgent else "#4ECDC4"
+
+    details = [
+        {
+            "type": "box",
+            "layout": "horizontal",
+            "contents": [
+                {"type": "text", "text": "日期", "size": "sm", "color": "#AAAAAA", "flex": 2},
+                {"type": "text", "text": appointment_date, "size": "sm", "color": "#333333", "flex": 5, "wrap": True},
+            ],
+        },
+        {
+            "type": "box",
+            "layout": "horizontal",
+            "contents": [
+                {"type": "text", "text": "時間", "size": "sm", "color": "#AAAAAA", "flex": 2},
+                {"type": "text", "text": appointment_time, "size": "sm", "color": "#333333", "flex": 5},
+            ],
+        },
+    ]
+    if clinic_address:
+        details.append({
+            "type": "box",
+            "layout": "horizontal",
+            "contents": [
+                {"type": "text", "text": "地點", "size": "sm", "color": "#AAAAAA", "flex": 2},
+                {"type": "text", "text": clinic_address, "size": "sm", "color": "#333333", "flex": 5, "wrap": True},
+            ],
+        })
+
+    body_contents = [
+        {"type": "text", "text": f"{customer_name} 您好", "weight": "bold", "size": "lg", "margin": "md"},
+        {
+            "type": "text",
+            "text": "您的預約即將在 2 小時內開始，請準時到達！" if is_urgent
+            else "溫馨提醒您明天有一個預約，請記得準時前往。",
+            "size": "sm",
+            "color": "#666666",
+            "wrap": True,
+            "margin": "md",
+        },
+        {"type": "separator", "margin": "lg"},
+        {"type": "box", "layout": "vertical", "margin": "lg", "spacing": "sm", "contents": details},
+    ]
+    if notes:
+        body_contents.append({
+            "type": "box",
+            "layout": "vertical",
+            "margin": "lg",
+            "contents": [
+                {"type": "text", "text": "注意事項", "size": "sm", "color": "#AAAAAA"},
+                {"type": "text", "text": notes, "size": "sm", "color": "#666666", "wrap": True, "margin": "sm"},
+            ],
+        })
+
+    return {
+        "type": "bubble",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "backgroundColor": header_color,
+            "paddingAll": "lg",
+            "contents": [
+                {"type": "text", "text": header_text, "color": "#FFFFFF", "weight": "bold", "size": "lg"},
+                {"type": "text", "text": clinic_name, "color": "#FFFFFFCC", "size": "sm", "margin": "sm"},
+            ],
+        },
+        "body": {"type": "box", "layout": "vertical", "contents": body_contents},
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "spacing": "sm",
+            "paddingAll": "lg",
+            "contents": [
+                {"type": "text", "text": "如需取消或改期，請提前聯繫我們", "size": "xs", "color": "#AAAAAA", "align": "center"},
+            ],
+        },
+    }
+
+
+# ============================================================
+# Database
+# ============================================================
+
+RECLAIM_SQL = """
+UPDATE appointment_reminders
+SET status = 'failed', error_message = 'claim lease expired'
+WHERE status = 'pending' AND reminder_type = $1 AND created_at < now() - $2::interval
+"""
+
+# 以 appointment_date + appointment_time（HH:MM）精準比對時間窗；
+# 無法解析時間時退回 reminderScheduler.ts 的日期範圍判斷
+CLAIM_SQL = r"""
+WITH due AS (
+    SELECT a.id, a.tenant_id, c.line_user_id
+    FROM appointments a
+    LEFT JOIN customers c ON c.id = a.customer_id
+    WHERE a.status IN ('approved', 'pending')
+      AND a.appointment_date::date BETWEEN $2::date AND $3::date
+      AND (
+        COALESCE(a.appointment_time::text, '') !~ '^\d{1,2}:\d{2}'
+        OR (a.appointment_date::date + substring(a.appointment_time::text from '^\d{1,2}:\d{2}')::time)
+           AT TIME ZONE $6 BETWEEN $4 AND $5
+      )
+      AND a.id <> ALL($8::bigint[])
+      AND NOT EXISTS (
+        SELECT 1 FROM appointment_reminders r
+        WHERE r.appointment_id = a.id
+          AND r.reminder_type = $1
+          AND (
+            r.status IN ('pending', 'sent', 'skipped')
+            OR (r.status = 'failed' AND r.error_message LIKE $10 || '%')
+          )
+      )
+      AND (
+        SELECT count(*) FROM appointment_reminders r
+        WHERE r.appointment_id = a.id AND r.reminder_type = $1 AND r.status = 'failed'
+      ) < $9
+    ORDER BY a.id
+    LIMIT $7
+    FOR UPDATE OF a SKIP LOCKED
+), claimed AS (
+    INSERT INTO appointment_reminders (appointment_id, tenant_id, reminder_type, channel, status, error_message, sent_at)
+    SELECT id, tenant_id, $1, 'line',
+           CASE WHEN NULLIF(line_user_id, '') IS NULL THEN 'skipped' ELSE 'pending' END,
+           CASE WHEN NULLIF(line_user_id, '') IS NULL THEN 'customer has no LINE user id' END,
+           CASE WHEN NULLIF(line_user_id, '') IS NULL THEN now() END
+    FROM due
+    ON CONFLICT (appointment_id, reminder_type) WHERE status IN ('pending', 'sent', 'skipped') DO NOTHING
+    RETURNING id, appointment_id, status
+)
+SELECT cl.id AS reminder_id, cl.status, a.id AS appointment_id, a.tenant_id,
+       a.appointment_date::text AS appointment_date, a.appointment_time::text AS appointment_time,
+       c.name AS customer_name, c.line_user_id
+FROM claimed cl
+JOIN appointments a ON a.id = cl.appointment_id
+LEFT JOIN customers c ON c.id = a.customer_id
+"""
+
+TOKENS_SQL = """
+SELECT t.tenant_id,
+       COALESCE(
+         NULLIF(lc.channel_access_token, ''),
+         NULLIF(ts.notification_settings -> 'line' ->> 'channel_access_token', '')
+       ) AS channel_access_token
+FROM unnest($1::bigint[]) AS t(tenant_id)
+LEFT JOIN tenant_line_configs lc ON lc.tenant_id = t.tenant_id
+LEFT JOIN tenant_settings ts ON ts.tenant_id = t.tenant_id
+"""
+
+RECORD_SQL = """
+UPDATE appointment_reminders r
+SET status = v.status, error_message = v.error_message, sent_at = now()
+FROM unnest($1::bigint[], $2::text[], $3::text[]) AS v(id, status, error_message)
+WHERE r.id = v.id
+"""
+
+
+def scan_window(reminder_type, now, tz):
+    """Return (start_date, end_date, start_ts, end_ts) for a reminder type."""
+    target = now + datetime.timedelta(hours=REMINDER_WINDOWS[reminder_type])
+    start = target - datetime.timedelta(minutes=WINDOW_MINUTES)
+    end = target + datetime.timedelta(minutes=WINDOW_MINUTES)
+    return start.astimezone(tz).date(), end.astimezone(tz).date(), start, end
+
+
+async def claim_batch(pool, reminder_type, now, tz, batch_size, exclude=(),
+                      max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Claim up to batch_size due reminders, skipping appointment ids in `exclude`."""
+    start_date, end_date, start_ts, end_ts = scan_window(reminder_type, now, tz)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(RECLAIM_SQL, reminder_type, CLAIM_LEASE)
+            return await conn.fetch(
+                CLAIM_SQL, reminder_type, start_date, end_date, start_ts, end_ts, tz.key, batch_size,
+                list(exclude), max_attempts, PERMANENT_ERROR_PREFIX,
+            )
+
+
+async def load_tokens(pool, tenant_ids):
+    rows = await pool.fetch(TOKENS_SQL, list(tenant_ids))
+    return {
+        row["tenant_id"]: row["channel_access_token"] or SYSTEM_LINE_CHANNEL_ACCESS_TOKEN
+        for row in rows
+    }
+
+
+async def record_results(pool, results):
+    if not results:
+        return
+    ids, statuses, errors = zip(*results)
+    await pool.execute(RECORD_SQL, list(ids), list(statuses), list(errors))
+
+
+# ============================================================
+# LINE sender
+# ============================================================
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LineSender:
+    """Sends messages over a shared HTTP client, rate limited per channel."""
+
+    def __init__(self, client, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_retries=DEFAULT_MAX_RETRIES):
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._buckets = {}
+
+    def _bucket(self, token):
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            bucket = self._buckets[token] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def send(self, token, recipients, messages, retry_key=None):
+        """Push to one recipient or multicast to many; returns (ok, error, status).
+
+        `status` is the last HTTP status, or None after a network error.
+        """
+        if len(recipients) == 1:
+            path, body = "/message/push", {"to": recipients[0], "messages": messages}
+        else:
+            path, body = "/message/multicast", {"to": recipients, "messages": messages}
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "X-Line-Retry-Key": retry_key or str(uuid.uuid4()),
+        }
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt, error))
+            await self._bucket(token).acquire()
+            try:
+                response = await self.client.post(path, json=body, headers=headers)
+            except httpx.TransportError as e:
+                error = (None, f"{type(e).__name__}: {e}")
+                continue
+            status = response.status_code
+            if status == 200:
+                return True, None, status
+            # 409 with a retry key means an earlier attempt was already accepted
+            if status == 409 and response.headers.get("x-line-accepted-request-id"):
+                return True, None, status
+            error = (response, f"LINE API {status}: {response.text[:500]}")
+            if status not in RETRYABLE_STATUS:
+                # A multicast 4xx may be one bad recipient; leave it to the caller
+                if status in TOKEN_ERROR_STATUS or (400 <= status < 500 and len(recipients) == 1):
+                    return False, PERMANENT_ERROR_PREFIX + error[1], status
+                break
+        return False, error[1], error[0].status_code if error[0] is not None else None
+
+    @staticmethod
+    def _backoff(attempt, error):
+        response = error[0] if error else None
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(30.0, 0.5 * 2 ** (attempt - 1)) * (0.5 + random.random())
+
+
+# ============================================================
+# Dispatch
+# ============================================================
+
+def retry_key(reminder_type, appointment_ids):
+    """X-Line-Retry-Key for one request: stable across re-claims of the same reminders."""
+    name = reminder_type + ":" + ",".join(str(a) for a in sorted(appointment_ids))
+    return str(uuid.uuid5(RETRY_KEY_NAMESPACE, name))
+
+
+def group_reminders(rows, tokens, reminder_type):
+    """Group claimed reminders by (channel token, identical message payload).
+
+    Returns ({(token, payload_json): {line_user_id: [(reminder_id, appointment_id), ...]}},
+    failures).
+    """
+    groups = {}
+    failures = []
+    for row in rows:
+        token = tokens.get(row["tenant_id"]) or SYSTEM_LINE_CHANNEL_ACCESS_TOKEN
+        if not token:
+            failures.append((row["reminder_id"], "failed", "LINE_CHANNEL_ACCESS_TOKEN is not configured"))
+            continue
+        contents = build_reminder_flex_message(
+            customer_name=row["customer_name"] or "",
+            appointment_date=row["appointment_date"] or "",
+            appointment_time=row["appointment_time"] or "待確認",
+            reminder_type=reminder_type,
+        )
+        payload = json.dumps(
+            [{"type": "flex", "altText": "預約提醒通知", "contents": contents}],
+            ensure_ascii=False, sort_keys=True,
+        )
+        recipients = groups.setdefault((token, payload), {})
+        recipients.setdefault(row["line_user_id"], []).append((row["reminder_id"], row["appointment_id"]))
+    return groups, failures
+
+
+async def dispatch(sender, groups, concurrency, reminder_type):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def send_chunk(token, messages, chunk):
+        key = retry_key(reminder_type, [a for _, reminders in chunk for _, a in reminders])
+        async with semaphore:
+            ok, error, http_status = await sender.send(token, [user for user, _ in chunk], messages, retry_key=key)
+        if http_status == 400 and len(chunk) > 1:
+            # LINE rejects the whole multicast for one invalid user id
+            await asyncio.gather(*(send_chunk(token, messages, [item]) for item in chunk))
+            return
+        status = "sent" if ok else "failed"
+        for _, reminders in chunk:
+            results.extend((reminder_id, status, error) for reminder_id, _ in reminders)
+
+    tasks = []
+    for (token, payload), recipients in groups.items():
+        messages = json.loads(payload)
+        items = list(recipients.items())
+        for i in range(0, len(items), MULTICAST_LIMIT):
+            tasks.append(send_chunk(token, messages, items[i:i + MULTICAST_LIMIT]))
+    await asyncio.gather(*tasks)
+    return results
+
+
+async def run_reminders(pool, sender, reminder_type, tz, batch_size=DEFAULT_BATCH_SIZE,
+                        concurrency=DEFAULT_CONCURRENCY, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Claim and send every due reminder of one type; returns sent/failed/skipped counts."""
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Appointments already tried in this run; failures wait for the next run
+    attempted = set()
+    while True:
+        rows = await claim_batch(pool, reminder_type, now, tz, batch_size,
+                                 exclude=attempted, max_attempts=max_attempts)
+        if not rows:
+            break
+        attempted.update(row["appointment_id"] for row in rows)
+        pending = [row for row in rows if row["status"] == "pending"]
+        counts["skipped"] += len(rows) - len(pending)
+
+        tokens = await load_tokens(pool, {row["tenant_id"] for row in pending})
+        groups, results = group_reminders(pending, tokens, reminder_type)
+        results.extend(await dispatch(sender, groups, concurrency, reminder_type))
+        await record_results(pool, results)
+
+        for _, status, _ in results:
+            counts[status] += 1
+        if len(rows) < batch_size:
+            break
+    return counts
+
+
+async def main_async(args):
+    import asyncpg
+
+    database_url = os.environ.get("DATABASE_URL", "")
+    if not database_url:
+        print("Error: DATABASE_URL is not set", file=sys.stderr)
+        return 2
+    tz = ZoneInfo(args.timezone)
+    reminder_types = [args.type] if args.type else list(REMINDER_WINDOWS)
+
+    pool = await asyncpg.create_pool(database_url, min_size=1, max_size=4)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=LINE_API_BASE, limits=limits, timeout=10.0) as client:
+            sender = LineSender(client, rate=args.rate, burst=args.burst, max_retries=args.max_retries)
+            while True:
+                for reminder_type in reminder_types:
+                    started = time.perf_counter()
+                    counts = await run_reminders(
+                        pool, sender, reminder_type, tz,
+                        batch_size=args.batch_size, concurrency=args.concurrency,
+                        max_attempts=args.max_attempts,
+                    )
+                    elapsed = time.perf_counter() - started
+                    print(f"[ReminderWorker] {reminder_type}: sent={counts['sent']} "
+                          f"failed={counts['failed']} skipped={counts['skipped']} ({elapsed:.2f}s)")
+                if not args.interval:
+                    break
+                await asyncio.sleep(args.interval)
+    finally:
+        await pool.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--type", choices=sorted(REMINDER_WINDOWS), help="only run one reminder window")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="seconds between runs; 0 runs once and exits")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="requests per second per channel")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST)
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="failed sends per appointment before it is no longer claimed")
+    parser.add_argument("--timezone", default=DEFAULT_TIMEZONE)
+    args = parser.parse_args(argv)
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
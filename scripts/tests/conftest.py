@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The scripts are run as `python scripts/<name>.py` and import each other as
+# top-level modules; mirror that for the tests.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
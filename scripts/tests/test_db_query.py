@@ -0,0 +1,179 @@
+import datetime
+import decimal
+import io
+import json
+
+import db_query
+from db_query import format_batch, split_script, split_statements
+
+
+def test_splits_on_top_level_semicolons():
+    assert split_statements("SELECT 1; SELECT 2;\nSELECT 3") == ["SELECT 1", "SELECT 2", "SELECT 3"]
+
+
+def test_semicolons_in_quotes_do_not_split():
+    assert split_statements("SELECT 'a;b', \"c;d\"; SELECT 1") == ["SELECT 'a;b', \"c;d\"", "SELECT 1"]
+
+
+def test_dollar_quoted_body_is_one_statement():
+    sql = "DO $$\nBEGIN\n  PERFORM 1;\n  PERFORM 2;\nEND $$;\nSELECT 1;"
+    assert split_statements(sql) == ["DO $$\nBEGIN\n  PERFORM 1;\n  PERFORM 2;\nEND $$", "SELECT 1"]
+
+
+def test_named_dollar_tag_and_positional_params():
+    sql = "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql; SELECT $1, $2"
+    assert split_statements(sql) == [
+        "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql",
+        "SELECT $1, $2",
+    ]
+
+
+def test_comments_do_not_split_and_comment_only_fragments_are_dropped():
+    sql = "-- header; still a comment\nSELECT 1; /* a; b */ SELECT 2; -- trailing;"
+    assert split_statements(sql) == ["-- header; still a comment\nSELECT 1", "/* a; b */ SELECT 2"]
+
+
+def test_postgres_backslash_is_literal_outside_escape_strings():
+    assert split_statements("SELECT 'a\\'; SELECT 1") == ["SELECT 'a\\'", "SELECT 1"]
+
+
+def test_postgres_escape_string():
+    assert split_statements("SELECT E'a\\'; b'") == ["SELECT E'a\\'; b'"]
+    assert split_statements("SELECT e'x\\'y'; SELECT 1") == ["SELECT e'x\\'y'", "SELECT 1"]
+
+
+def test_postgres_hash_is_an_operator():
+    assert split_statements("SELECT '{\"a\":1}'::jsonb #> '{a}'; SELECT 1") == [
+        "SELECT '{\"a\":1}'::jsonb #> '{a}'",
+        "SELECT 1",
+    ]
+
+
+def test_mysql_hash_comment_and_backslash_escape():
+    sql = "SELECT 'it\\'s; fine'; # comment; here\nSELECT 2"
+    assert split_statements(sql, dialect="mysql") == ["SELECT 'it\\'s; fine'", "# comment; here\nSELECT 2"]
+
+
+def test_split_script_keeps_unterminated_tail():
+    assert split_script("SELECT 1; SELECT 2") == (["SELECT 1"], " SELECT 2")
+    assert split_script("SELECT 'open;\n") == ([], "SELECT 'open;\n")
+    assert split_script("DO $$ BEGIN PERFORM 1;") == ([], "DO $$ BEGIN PERFORM 1;")
+    assert split_script("SELECT 1; /* open;") == (["SELECT 1"], " /* open;")
+    assert split_script("SELECT 1;\n-- done\n") == (["SELECT 1"], "")
+
+
+class _FakeExecutor:
+    name = "supabase"
+    dialect = "postgres"
+    log_dir = None
+
+    def __init__(self):
+        self.executed = []
+
+    def split(self, sql):
+        return split_statements(sql, self.dialect)
+
+    def execute_many(self, statements):
+        self.executed.extend(statements)
+        return []
+
+
+def test_repl_waits_for_dollar_quoted_body(monkeypatch):
+    lines = ["DO $$", "BEGIN", "  PERFORM 1;", "  PERFORM 2;", "END $$;", "SELECT 'a;", "b';", ""]
+    monkeypatch.setattr(db_query.sys, "stdin", io.StringIO("\n".join(lines)))
+    executor = _FakeExecutor()
+    db_query.repl(executor, log=False)
+    assert executor.executed == [
+        "DO $$\nBEGIN\n  PERFORM 1;\n  PERFORM 2;\nEND $$",
+        "SELECT 'a;\nb'",
+    ]
+
+
+class _FakeConn:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_idle_connection_without_check():
+    checked = []
+    pool = db_query.ConnectionPool(_FakeConn, size=1, check=checked.append)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert checked == []
+
+
+def test_pool_replaces_stale_connection_that_fails_check(monkeypatch):
+    def check(conn):
+        if not conn.alive:
+            raise OSError("server has gone away")
+
+    pool = db_query.ConnectionPool(_FakeConn, size=1, check=check)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    monkeypatch.setattr(db_query, "IDLE_CHECK_SECONDS", -1)
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert conn.closed
+
+
+def test_format_batch_keeps_duplicate_column_names():
+    assert format_batch(["id", "id"], [(1, None), (2, "x")]) == "id\tid\n1\tNULL\n2\tx\n"
+
+
+class _OperationalError(Exception):
+    pass
+
+
+def _executor_with(connect):
+    executor = db_query.QueryExecutor("supabase", "postgresql://unused", pool_size=1, log_dir=None)
+    executor.pool = db_query.ConnectionPool(connect, size=1)
+    return executor
+
+
+def test_execute_logs_connect_failure_as_error_entry():
+    def connect():
+        raise _OperationalError("could not connect to server: Connection refused")
+
+    executor = _executor_with(connect)
+    result = executor.execute("SELECT 1")
+    assert result == {
+        "query": "SELECT 1",
+        "command": "db_query.py --db supabase",
+        "returncode": 1,
+        "logs": ["could not connect to server: Connection refused"],
+    }
+    # The slot taken by the failed connect was given back
+    assert executor.execute("SELECT 1")["returncode"] == 1
+
+
+class _FakeCursor:
+    description = [("amounts",), ("days",)]
+
+    def execute(self, query):
+        pass
+
+    def fetchall(self):
+        return [([decimal.Decimal("1.50"), None], {"due": [datetime.date(2026, 1, 2)]})]
+
+    def close(self):
+        pass
+
+
+class _ArrayConn(_FakeConn):
+    def cursor(self):
+        return _FakeCursor()
+
+
+def test_execute_converts_nested_array_values(tmp_path):
+    result = _executor_with(_ArrayConn).execute("SELECT array_agg(amount), ...")
+    assert result["rows"] == [{"amounts": ["1.50", None], "days": {"due": ["2026-01-02"]}}]
+    assert result["stdout"] == 'amounts\tdays\n["1.50", null]\t{"due": ["2026-01-02"]}\n'
+    path = db_query.write_log(result, log_dir=str(tmp_path))
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["rows"] == result["rows"]
@@ -0,0 +1,163 @@
+import os
+
+import pytest
+
+import db_query
+import index_monitor
+from index_monitor import check_sql, find_overlapping_indexes, parse_create_indexes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _findings(sql):
+    return [(f["kind"], f["index"], f["covered_by"]) for f in find_overlapping_indexes(parse_create_indexes(sql))]
+
+
+def test_parse_create_index_variants():
+    sql = """
+    -- lookup index
+    CREATE UNIQUE INDEX IF NOT EXISTS "idx_a" ON public."Orders" USING btree (tenant_id, created_at DESC)
+        INCLUDE (status) WHERE deleted_at IS NULL;
+    CREATE INDEX CONCURRENTLY idx_b ON orders USING gin (lower(name), tags);
+    SELECT 1;
+    """
+    a, b = parse_create_indexes(sql, source="x.sql")
+    assert a == {
+        "schema": "public", "table": "orders", "index": "idx_a", "am": "btree", "is_unique": True,
+        "is_primary": False, "columns": ["tenant_id", "created_at"], "expressions": None,
+        "predicate": "deleted_at IS NULL", "source": "x.sql",
+    }
+    assert b["am"] == "gin"
+    assert b["columns"] == ["(expression)", "tags"]
+    assert b["expressions"] == "lower(name)"
+    assert b["predicate"] is None
+
+
+def test_commission_rules_service_and_lookup_are_duplicates():
+    sql = """
+    CREATE INDEX IF NOT EXISTS idx_commission_rules_tenant ON commission_rules(tenant_id);
+    CREATE INDEX IF NOT EXISTS idx_commission_rules_service ON commission_rules(tenant_id, service_id, role_type);
+    CREATE INDEX IF NOT EXISTS idx_commission_rules_lookup ON commission_rules(tenant_id, service_id, role_type);
+    """
+    assert _findings(sql) == [
+        ("duplicate", "idx_commission_rules_lookup", "idx_commission_rules_service"),
+        ("redundant_prefix", "idx_commission_rules_tenant", "idx_commission_rules_service"),
+    ]
+
+
+def test_tenant_prefix_shadowed_by_composite():
+    sql = """
+    CREATE INDEX idx_orders_tenant ON orders(tenant_id);
+    CREATE INDEX idx_orders_tenant_created ON orders(tenant_id, created_at);
+    CREATE INDEX idx_items_tenant ON items(tenant_id);
+    """
+    assert _findings(sql) == [("redundant_prefix", "idx_orders_tenant", "idx_orders_tenant_created")]
+
+
+def test_unique_prefix_is_not_flagged():
+    sql = """
+    CREATE UNIQUE INDEX idx_users_email ON users(email);
+    CREATE INDEX idx_users_email_tenant ON users(email, tenant_id);
+    """
+    assert _findings(sql) == []
+
+
+def test_partial_indexes_with_different_predicates_are_not_flagged():
+    sql = """
+    CREATE INDEX idx_reminders_pending ON reminders(appointment_id) WHERE status = 'pending';
+    CREATE INDEX idx_reminders_failed ON reminders(appointment_id) WHERE status = 'failed';
+    CREATE INDEX idx_reminders_pending_type ON reminders(appointment_id, reminder_type) WHERE status = 'sent';
+    """
+    assert _findings(sql) == []
+
+
+def test_partial_indexes_with_same_predicate_are_compared():
+    sql = """
+    CREATE INDEX idx_r_a ON reminders(appointment_id) WHERE status = 'pending';
+    CREATE INDEX idx_r_b ON reminders(appointment_id)   WHERE  status = 'pending';
+    """
+    assert _findings(sql) == [("duplicate", "idx_r_b", "idx_r_a")]
+
+
+def test_non_btree_and_expression_indexes_are_not_prefixes():
+    sql = """
+    CREATE INDEX idx_docs_tags ON docs USING gin (tags);
+    CREATE INDEX idx_docs_tags_owner ON docs USING gin (tags, owner_id);
+    CREATE INDEX idx_docs_lower ON docs(lower(title));
+    CREATE INDEX idx_docs_lower_owner ON docs(lower(title), owner_id);
+    """
+    assert _findings(sql) == []
+
+
+def test_check_sql_across_migration_and_script(capsys):
+    paths = [
+        os.path.join(REPO_ROOT, "migrations", "create_hrm_erp_tables.sql"),
+        os.path.join(REPO_ROOT, "scripts", "create_tables.py"),
+    ]
+    findings = {(f["index"], f["covered_by"]) for f in check_sql(paths)}
+    assert ("idx_commission_rules_service", "idx_commission_rules_lookup") in findings
+    assert "create_tables.py" in capsys.readouterr().out
+
+
+class _OperationalError(Exception):
+    pass
+
+
+def _unreachable():
+    raise _OperationalError("could not connect to server: Connection refused")
+
+
+def test_take_sample_reports_unreachable_database_as_runtime_error(tmp_path):
+    executor = db_query.QueryExecutor("supabase", "postgresql://unused", pool_size=1, log_dir=None)
+    executor.pool = db_query.ConnectionPool(_unreachable, size=1)
+    store = index_monitor.open_store(str(tmp_path / "store.db"))
+    try:
+        with pytest.raises(RuntimeError, match="Connection refused"):
+            index_monitor.take_sample(executor, store)
+    finally:
+        store.close()
+
+
+class _StopSampling(Exception):
+    pass
+
+
+class _NullExecutor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def test_interval_sampler_survives_a_failed_sample(tmp_path, monkeypatch, capsys):
+    outcomes = [RuntimeError("could not connect to server"), 1, 2]
+
+    def take_sample(executor, store):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def sleep(seconds):
+        if not outcomes:
+            raise _StopSampling
+
+    monkeypatch.setattr(index_monitor.QueryExecutor, "from_env", classmethod(lambda cls, *a, **kw: _NullExecutor()))
+    monkeypatch.setattr(index_monitor, "take_sample", take_sample)
+    monkeypatch.setattr(index_monitor.time, "sleep", sleep)
+
+    with pytest.raises(_StopSampling):
+        index_monitor.main(["--store", str(tmp_path / "store.db"), "sample", "--interval", "60"])
+    out, err = capsys.readouterr()
+    assert "sample failed: could not connect to server" in err
+    assert "sample 1 stored" in out and "sample 2 stored" in out
+
+
+def test_single_sample_failure_exits_nonzero(tmp_path, monkeypatch):
+    def take_sample(executor, store):
+        raise RuntimeError("could not connect to server")
+
+    monkeypatch.setattr(index_monitor.QueryExecutor, "from_env", classmethod(lambda cls, *a, **kw: _NullExecutor()))
+    monkeypatch.setattr(index_monitor, "take_sample", take_sample)
+    assert index_monitor.main(["--store", str(tmp_path / "store.db"), "sample"]) == 1
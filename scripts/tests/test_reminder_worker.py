@@ -0,0 +1,236 @@
+import asyncio
+import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import reminder_worker  # noqa: E402
+from reminder_worker import group_reminders  # noqa: E402
+
+
+def _row(reminder_id, tenant_id=1, line_user_id=None, customer_name="王小明", appointment_id=None):
+    return {
+        "reminder_id": reminder_id,
+        "appointment_id": appointment_id if appointment_id is not None else reminder_id,
+        "status": "pending",
+        "tenant_id": tenant_id,
+        "customer_name": customer_name,
+        "appointment_date": "2026-10-20",
+        "appointment_time": "10:00",
+        "line_user_id": line_user_id or f"U{reminder_id}",
+    }
+
+
+def test_group_reminders_merges_identical_payloads_per_channel(monkeypatch):
+    monkeypatch.setattr(reminder_worker, "SYSTEM_LINE_CHANNEL_ACCESS_TOKEN", "")
+    rows = [
+        _row(1, tenant_id=1),
+        _row(2, tenant_id=1),
+        _row(3, tenant_id=1, customer_name="李小華"),
+        _row(4, tenant_id=2),
+        _row(5, tenant_id=1, line_user_id="U1"),
+        _row(6, tenant_id=3),
+    ]
+    groups, failures = group_reminders(rows, {1: "tokA", 2: "tokB"}, "24h")
+
+    assert failures == [(6, "failed", "LINE_CHANNEL_ACCESS_TOKEN is not configured")]
+    by_token = {}
+    for (token, _), recipients in groups.items():
+        by_token.setdefault(token, []).append(recipients)
+    assert sorted(by_token) == ["tokA", "tokB"]
+    # Same name / date / time on the same channel share one payload; the
+    # repeat recipient U1 carries both reminders
+    assert {"U1": [(1, 1), (5, 5)], "U2": [(2, 2)]} in by_token["tokA"]
+    assert {"U3": [(3, 3)]} in by_token["tokA"]
+    assert by_token["tokB"] == [{"U4": [(4, 4)]}]
+
+
+def test_run_reminders_does_not_reclaim_failures_in_the_same_run(monkeypatch):
+    monkeypatch.setattr(reminder_worker, "SYSTEM_LINE_CHANNEL_ACCESS_TOKEN", "")
+    due = [10, 11, 12]
+    inserted = []
+
+    async def claim_batch(pool, reminder_type, now, tz, batch_size, exclude=(), max_attempts=None):
+        # Failed rows do not block a claim, as in CLAIM_SQL
+        ids = [a for a in due if a not in exclude][:batch_size]
+        inserted.extend(ids)
+        return [_row(len(inserted) * 100 + a, appointment_id=a) for a in ids]
+
+    async def load_tokens(pool, tenant_ids):
+        return {}
+
+    async def record_results(pool, results):
+        pass
+
+    monkeypatch.setattr(reminder_worker, "claim_batch", claim_batch)
+    monkeypatch.setattr(reminder_worker, "load_tokens", load_tokens)
+    monkeypatch.setattr(reminder_worker, "record_results", record_results)
+
+    counts = asyncio.run(asyncio.wait_for(
+        reminder_worker.run_reminders(None, None, "24h", ZoneInfo("Asia/Taipei"), batch_size=2),
+        timeout=5,
+    ))
+    assert counts == {"sent": 0, "failed": 3, "skipped": 0}
+    assert sorted(inserted) == due
+
+
+def test_scan_window_is_centered_on_target():
+    now = datetime.datetime(2026, 10, 19, 15, 45, tzinfo=datetime.timezone.utc)
+    start_date, end_date, start, end = reminder_worker.scan_window("24h", now, ZoneInfo("Asia/Taipei"))
+    assert (start_date, end_date) == (datetime.date(2026, 10, 20), datetime.date(2026, 10, 21))
+    assert end - start == datetime.timedelta(hours=1)
+
+
+# ============================================================
+# LineSender / dispatch against scripts/line_api_stub.py
+# ============================================================
+
+@pytest.fixture
+def line_stub():
+    import threading
+    from http.server import ThreadingHTTPServer
+
+    from line_api_stub import StubState, make_handler
+
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield state, f"http://127.0.0.1:{server.server_address[1]}/v2/bot"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _run_sender(base_url, coro_fn, **sender_kwargs):
+    import httpx
+
+    async def run():
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            sender = reminder_worker.LineSender(client, rate=1000, burst=1000, **sender_kwargs)
+            return await coro_fn(sender)
+
+    return asyncio.run(run())
+
+
+MESSAGES = [{"type": "text", "text": "hi"}]
+
+
+def test_429_retry_reuses_retry_key(line_stub, monkeypatch):
+    state, base_url = line_stub
+    state.fail_every = 2
+    monkeypatch.setattr(reminder_worker.LineSender, "_backoff", staticmethod(lambda attempt, error: 0))
+
+    async def send_two(sender):
+        first = await sender.send("tok", ["U1"], MESSAGES)
+        second = await sender.send("tok", ["U2"], MESSAGES)
+        return first, second
+
+    assert _run_sender(base_url, send_two) == ((True, None, 200), (True, None, 200))
+    statuses = [a["status"] for a in state.attempts]
+    assert statuses == [200, 429, 200]
+    assert state.attempts[1]["retry_key"] == state.attempts[2]["retry_key"]
+    assert state.attempts[0]["retry_key"] != state.attempts[1]["retry_key"]
+    assert [r["body"]["to"] for r in state.requests] == ["U1", "U2"]
+
+
+def test_already_accepted_retry_key_counts_as_sent(line_stub, monkeypatch):
+    state, base_url = line_stub
+    state.retry_keys["11111111-1111-1111-1111-111111111111"] = "accepted-request"
+    monkeypatch.setattr(reminder_worker.uuid, "uuid4", lambda: "11111111-1111-1111-1111-111111111111")
+
+    result = _run_sender(base_url, lambda sender: sender.send("tok", ["U1"], MESSAGES))
+    assert result == (True, None, 409)
+    assert [a["status"] for a in state.attempts] == [409]
+    assert state.requests == []
+
+
+def test_permanent_4xx_is_not_retried(line_stub):
+    state, base_url = line_stub
+    state.fail_every = 1
+    state.fail_status = 401
+
+    ok, error, status = _run_sender(base_url, lambda sender: sender.send("revoked", ["U1"], MESSAGES))
+    assert not ok and status == 401
+    assert error.startswith(reminder_worker.PERMANENT_ERROR_PREFIX + "LINE API 401")
+    assert len(state.attempts) == 1
+
+
+def test_dispatch_caps_multicast_chunks_at_500(line_stub):
+    state, base_url = line_stub
+    recipients = {f"U{i}": [(i, i)] for i in range(1201)}
+    groups = {("tok", '[{"type": "text", "text": "hi"}]'): recipients}
+
+    results = _run_sender(base_url, lambda sender: reminder_worker.dispatch(sender, groups, 4, "24h"))
+
+    assert sorted(r[0] for r in results) == list(range(1201))
+    assert {r[1] for r in results} == {"sent"}
+    sizes = sorted(len(r["body"]["to"]) for r in state.requests)
+    assert sizes == [201, 500, 500]
+    assert {r["path"] for r in state.requests} == {"/v2/bot/message/multicast"}
+
+
+def test_reclaimed_reminders_are_not_delivered_twice(line_stub):
+    state, base_url = line_stub
+
+    def claim(first_reminder_id):
+        # A re-claim inserts new reminder rows for the same appointments
+        rows = [_row(first_reminder_id + i, line_user_id=f"U{a}", appointment_id=a) for i, a in enumerate([10, 11, 12])]
+        rows.append(_row(first_reminder_id + 3, line_user_id="U13", appointment_id=13, customer_name="李小華"))
+        groups, _ = group_reminders(rows, {1: "tok"}, "24h")
+        return groups
+
+    async def send_twice(sender):
+        first = await reminder_worker.dispatch(sender, claim(100), 4, "24h")
+        # The worker died before record_results; the lease expired and the
+        # next run claims and sends the same reminders again
+        second = await reminder_worker.dispatch(sender, claim(200), 4, "24h")
+        other_type = await reminder_worker.dispatch(sender, claim(300), 4, "2h")
+        return first, second, other_type
+
+    first, second, other_type = _run_sender(base_url, send_twice)
+    assert {r[1] for r in first + second + other_type} == {"sent"}
+    assert sorted(a["status"] for a in state.attempts) == [200, 200, 200, 200, 409, 409]
+    # Only the first run and the 2h reminders were delivered
+    assert sorted(len(r["body"]["to"]) if isinstance(r["body"]["to"], list) else 1
+                  for r in state.requests) == [1, 1, 3, 3]
+
+
+def test_retry_key_is_stable_and_specific():
+    key = reminder_worker.retry_key("24h", [3, 1, 2])
+    assert key == reminder_worker.retry_key("24h", [1, 2, 3])
+    assert key != reminder_worker.retry_key("2h", [1, 2, 3])
+    assert key != reminder_worker.retry_key("24h", [1, 2])
+
+
+def test_multicast_400_falls_back_to_pushes(line_stub):
+    state, base_url = line_stub
+    groups = {("tok", '[{"type": "text", "text": "hi"}]'): {"U1": [(1, 1)], "bad": [(2, 2)], "U3": [(3, 3)]}}
+
+    results = _run_sender(base_url, lambda sender: reminder_worker.dispatch(sender, groups, 4, "24h"))
+
+    by_id = {reminder_id: (status, error) for reminder_id, status, error in results}
+    assert by_id[1] == ("sent", None) and by_id[3] == ("sent", None)
+    assert by_id[2][0] == "failed"
+    assert by_id[2][1].startswith(reminder_worker.PERMANENT_ERROR_PREFIX + "LINE API 400")
+    assert sorted(r["body"]["to"] for r in state.requests) == ["U1", "U3"]
+
+
+def test_multicast_4xx_is_retryable_and_token_errors_are_permanent(line_stub):
+    state, base_url = line_stub
+    state.fail_every = 1
+
+    async def multicast(sender):
+        state.fail_status = 413
+        too_large = await sender.send("tok", ["U1", "U2"], MESSAGES)
+        state.fail_status = 403
+        forbidden = await sender.send("tok", ["U1", "U2"], MESSAGES)
+        return too_large, forbidden
+
+    (ok, too_large, _), (_, forbidden, _) = _run_sender(base_url, multicast)
+    assert not ok
+    assert too_large.startswith("LINE API 413")
+    assert forbidden.startswith(reminder_worker.PERMANENT_ERROR_PREFIX + "LINE API 403")